@@ -9,131 +9,59 @@ import ssl
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
-from fpdf import FPDF
+import letter_pdf
+from letter_pdf import MissingGlyphsError, format_visit_window
 import datetime
-import io
 import base64
 import re
 import json
 import os
+import hashlib
+import mailbox
+import unicodedata
+from email import message_from_bytes
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr, parsedate_to_datetime
+import queue
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
 
 # Configuration
 DIRECTOR_EMAIL = "dir.arch@reva.edu.in"
 OFFICE_EMAIL = "swathi.bp@reva.edu.in"
 
+# Submission queue settings (deadline-day surges)
+DATA_DIR = os.environ.get("REVA_DATA_DIR", "data")
+SUBMISSION_JOURNAL = os.path.join(DATA_DIR, "submission_journal.jsonl")
+SUBMISSION_WORKERS = int(os.environ.get("REVA_SUBMISSION_WORKERS", "4"))
+SUBMISSION_QUEUE_MAX = int(os.environ.get("REVA_SUBMISSION_QUEUE_MAX", "500"))
+SUBMISSION_MAX_ATTEMPTS = 3
+SUBMISSION_RETRY_SECONDS = 0.5
+SUBMISSION_COMPACT_EVERY = 1000
+
+# Director email replies ("APPROVED - CSR-...")
+REPLY_MAILBOX = os.environ.get("REVA_REPLY_MAILBOX", os.path.join(DATA_DIR, "director_replies.mbox"))
+PROCESSED_MESSAGE_IDS = os.path.join(DATA_DIR, "processed_message_ids.txt")
+DEFERRED_MESSAGE_IDS = os.path.join(DATA_DIR, "deferred_message_ids.json")
+REPLY_MAX_AGE_DAYS = int(os.environ.get("REVA_REPLY_MAX_AGE_DAYS", "14"))
+
+# Site visit scheduling
+MAX_VISIT_WINDOW_DAYS = 90
+VISIT_CALENDAR_LOG = os.path.join(DATA_DIR, "visit_calendar.jsonl")
+
+# Per-session memory budget for generated PDFs and exports
+SESSION_ARTIFACT_BUDGET = int(os.environ.get("REVA_SESSION_ARTIFACT_MB", "8")) * 1024 * 1024
+SESSION_IDLE_SECONDS = int(os.environ.get("REVA_SESSION_IDLE_MINUTES", "30")) * 60
+
 # Initialize session state for data storage
 if 'requests_db' not in st.session_state:
     st.session_state.requests_db = []
-if 'request_counter' not in st.session_state:
-    st.session_state.request_counter = 1000
-
-class CaseStudyPDF(FPDF):
-    def header(self):
-        # University Header
-        self.set_font('Arial', 'B', 20)
-        self.cell(0, 15, 'REVA UNIVERSITY', 0, 1, 'C')
-        self.set_font('Arial', 'B', 16)
-        self.cell(0, 10, 'SCHOOL OF ARCHITECTURE', 0, 1, 'C')
-        self.set_font('Arial', '', 12)
-        self.cell(0, 8, 'Bangalore, Karnataka, India', 0, 1, 'C')
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def generate_request_id():
-    """Generate unique request ID"""
-    st.session_state.request_counter += 1
-    return f"CSR-{datetime.datetime.now().strftime('%Y%m%d')}-{st.session_state.request_counter}"
-
-def create_official_letter(request_data):
-    """Generate official permission letter PDF"""
-    pdf = CaseStudyPDF()
-    pdf.add_page()
-    
-    # Date and Reference
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 8, f"Date: {datetime.datetime.now().strftime('%B %d, %Y')}", 0, 1)
-    pdf.cell(0, 8, f"Ref: {request_data['request_id']}", 0, 1)
-    pdf.ln(5)
-    
-    # Recipient Details
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 8, 'To: The Concerned Authority', 0, 1)
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 8, request_data['building_name'], 0, 1)
-    pdf.multi_cell(0, 6, request_data['building_address'])
-    pdf.ln(5)
-    
-    # Subject
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 8, 'Subject: Permission for Architectural Case Study Research', 0, 1)
-    pdf.ln(5)
-    
-    # Main Content
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 8, 'Dear Sir/Madam,', 0, 1)
-    pdf.ln(3)
-    
-    # Student Introduction
-    intro_text = f"This letter serves as an official recommendation for {request_data['student_name']}, Student ID: {request_data['student_id']}, a {request_data['year']} year student pursuing {request_data['program']} at REVA University, School of Architecture."
-    pdf.multi_cell(0, 6, intro_text)
-    pdf.ln(3)
-    
-    # Case Study Details
-    details_text = f"The student is conducting an architectural case study of {request_data['building_name']} as part of their academic research work for the course '{request_data['course']}' under the guidance of {request_data['faculty_guide']}."
-    pdf.multi_cell(0, 6, details_text)
-    pdf.ln(3)
-    
-    # Study Requirements
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 8, 'Study Requirements:', 0, 1)
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 6, f"• Purpose: {request_data['purpose']}", 0, 1)
-    pdf.cell(0, 6, f"• Building Type: {request_data['building_type']}", 0, 1)
-    pdf.cell(0, 6, f"• Expected Duration: {request_data['duration']}", 0, 1)
-    pdf.cell(0, 6, f"• Number of Visits: {request_data['visits']}", 0, 1)
-    pdf.cell(0, 6, f"• Documentation Required: {request_data['documentation']}", 0, 1)
-    pdf.ln(5)
-    
-    # Academic Declaration
-    declaration_text = "This study is strictly for academic and research purposes only. All documentation will be used solely for educational objectives and will not be used for any commercial purposes."
-    pdf.multi_cell(0, 6, declaration_text)
-    pdf.ln(3)
-    
-    # Request
-    request_text = "We kindly request your permission to allow our student to conduct this case study. The student has been briefed on maintaining professionalism and respecting all property guidelines."
-    pdf.multi_cell(0, 6, request_text)
-    pdf.ln(3)
-    
-    # Closing
-    pdf.multi_cell(0, 6, "Thank you for your cooperation in supporting architectural education.")
-    pdf.ln(8)
-    
-    # Signature Block
-    pdf.cell(0, 8, 'Yours sincerely,', 0, 1)
-    pdf.ln(15)
-    
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 6, '[DIGITAL SIGNATURE]', 0, 1)
-    pdf.cell(0, 6, 'Dr. [Director Name]', 0, 1)
-    pdf.cell(0, 6, 'Director, School of Architecture', 0, 1)
-    pdf.cell(0, 6, 'REVA University', 0, 1)
-    pdf.set_font('Arial', '', 10)
-    pdf.cell(0, 6, f'Email: {DIRECTOR_EMAIL}', 0, 1)
-    pdf.cell(0, 6, 'Phone: [Director Phone]', 0, 1)
-    
-    # Footer Information
-    pdf.ln(10)
-    pdf.set_font('Arial', '', 8)
-    pdf.cell(0, 4, '-' * 80, 0, 1)
-    pdf.cell(0, 4, f"Request ID: {request_data['request_id']}", 0, 1)
-    pdf.cell(0, 4, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}", 0, 1)
-    pdf.cell(0, 4, 'Status: APPROVED - Official Permission Letter', 0, 1)
-    
-    return pdf
+
+def render_letter_pdf(request_data):
+    """Render the official letter to compressed PDF bytes"""
+    return letter_pdf.render_letter_pdf(request_data, DIRECTOR_EMAIL)
 
 def send_approval_email(request_data):
     """Generate approval email content for director"""
@@ -162,6 +90,7 @@ STUDY REQUIREMENTS:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 • Duration: {request_data['duration']}
 • Visits: {request_data['visits']}
+• Visit Dates: {format_visit_window(request_data)}
 • Documentation: {request_data['documentation']}
 
 REQUEST ID: {request_data['request_id']}
@@ -236,7 +165,7 @@ APPROVAL DETAILS:
 • Address: {request_data['building_address']}
 • Purpose: {request_data['purpose']}
 • Request ID: {request_data['request_id']}
-• Approved: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}
+• Approved: {(request_data.get('approval_date') or datetime.datetime.now()).strftime('%Y-%m-%d %H:%M')}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 NEXT STEPS:
@@ -266,16 +195,758 @@ For queries: {OFFICE_EMAIL}
 """
     return email_content
 
-# Streamlit App Configuration
-st.set_page_config(
-    page_title="REVA Case Study Management",
-    page_icon="🏛️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def _json_default(value):
+    """Serialize dates for the submission journal"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
 
-# Custom CSS
-st.markdown("""
+def _decode_request(record):
+    """Restore date fields of a request read back from the journal"""
+    request_data = dict(record)
+    for field in ('submission_date', 'approval_date'):
+        if isinstance(request_data.get(field), str):
+            request_data[field] = datetime.datetime.fromisoformat(request_data[field])
+    for field in ('visit_start', 'visit_end'):
+        if isinstance(request_data.get(field), str):
+            request_data[field] = datetime.date.fromisoformat(request_data[field])
+    return request_data
+
+def _percentile(samples, pct):
+    """Nearest-rank percentile of a sample window (0.0 when empty)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class SubmissionQueue:
+    """Admission control and shared record of student submissions.
+
+    Requests are appended to a journal file and handed to a fixed pool of
+    worker threads that render the director and confirmation emails, so the
+    submit path only pays for one journal write. When the backlog reaches
+    ``max_pending`` new submissions are refused instead of queued. The
+    journal also carries the request ID counter and the director's
+    decisions, so every request and its status is rebuilt after a restart.
+    """
+
+    def __init__(self, journal_path, workers=4, max_pending=500, outbox_size=2000,
+                 max_attempts=3, retry_seconds=0.5, compact_every=1000):
+        self.journal_path = journal_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.compact_every = compact_every
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._decision_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._requests = OrderedDict()
+        self._outbox = {}
+        self._outbox_order = deque()
+        self._outbox_size = outbox_size
+        self._outstanding = {}
+        self._waiting = set()
+        self._done_since_compact = 0
+        self._last_request_number = 1000
+        self._in_flight = 0
+        self._counts = {'accepted': 0, 'rejected': 0, 'processed': 0, 'retried': 0, 'failed': 0, 'recovered': 0}
+        self._admit_ms = deque(maxlen=1000)
+        self._process_ms = deque(maxlen=1000)
+
+        os.makedirs(os.path.dirname(journal_path) or '.', exist_ok=True)
+        self._recover()
+        for n in range(workers):
+            threading.Thread(target=self._work, name=f"submission-worker-{n}", daemon=True).start()
+
+    def _append_journal(self, entries):
+        """Append journal entries and fsync so accepted requests survive a restart"""
+        lines = ''.join(json.dumps(entry, default=_json_default) + '\n' for entry in entries)
+        with self._journal_lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(lines)
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    def _compact_journal(self):
+        """Rewrite the journal as the ID counter plus one entry per request"""
+        with self._journal_lock:
+            with self._lock:
+                entries = [{'op': 'counter', 'value': self._last_request_number}]
+                entries.extend({'op': 'queued' if request_id in self._outstanding else 'request',
+                                'request': request_data}
+                               for request_id, request_data in self._requests.items())
+                self._done_since_compact = 0
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as journal:
+                journal.write(''.join(json.dumps(entry, default=_json_default) + '\n' for entry in entries))
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def _recover(self):
+        """Rebuild requests and the ID counter, and re-queue emails that were never rendered"""
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    op = entry.get('op')
+                    if op == 'counter':
+                        self._last_request_number = max(self._last_request_number, entry['value'])
+                    elif op in ('queued', 'request'):
+                        request_data = _decode_request(entry['request'])
+                        self._requests[request_data['request_id']] = request_data
+                        if op == 'queued':
+                            self._outstanding[request_data['request_id']] = request_data
+                        number = request_data['request_id'].rsplit('-', 1)[-1]
+                        if number.isdigit():
+                            self._last_request_number = max(self._last_request_number, int(number))
+                    elif op == 'done':
+                        self._outstanding.pop(entry.get('request_id'), None)
+                    elif op == 'status' and entry.get('request_id') in self._requests:
+                        self._requests[entry['request_id']].update(_decode_request(entry['changes']))
+
+        self._compact_journal()
+        for request_data in self._outstanding.values():
+            self._queue.put((request_data, time.perf_counter(), 1))
+        self._waiting = set(self._outstanding)
+        self._counts['recovered'] = len(self._outstanding)
+
+    def submit(self, request_data):
+        """Assign the next request ID, then journal and enqueue the request.
+
+        The counter and the request go to the journal in a single write.
+        Returns the new request ID, or None when the queue is full.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if len(self._waiting) >= self.max_pending:
+                self._counts['rejected'] += 1
+                return None
+            self._last_request_number += 1
+            number = self._last_request_number
+            request_id = f"CSR-{datetime.datetime.now().strftime('%Y%m%d')}-{number}"
+            request_data['request_id'] = request_id
+            self._waiting.add(request_id)
+            self._counts['accepted'] += 1
+            # Registered before the journal write so a concurrent compaction keeps it
+            self._requests[request_id] = request_data
+            self._outstanding[request_id] = request_data
+        try:
+            self._append_journal([{'op': 'counter', 'value': number}, {'op': 'queued', 'request': request_data}])
+        except OSError:
+            with self._lock:
+                self._waiting.discard(request_id)
+                self._counts['accepted'] -= 1
+                self._requests.pop(request_id, None)
+                self._outstanding.pop(request_id, None)
+            raise
+        self._queue.put((request_data, started, 1))
+        with self._lock:
+            self._admit_ms.append((time.perf_counter() - started) * 1000)
+        return request_id
+
+    def requests(self):
+        """Every request, in submission order"""
+        with self._lock:
+            return list(self._requests.values())
+
+    def get(self, request_id):
+        with self._lock:
+            return self._requests.get(request_id)
+
+    def decide(self, request_id, status, comments=''):
+        """Journal the director's decision on a pending request.
+
+        Returns the updated request, or None if it is unknown or no longer
+        pending (e.g. decided meanwhile in another session).
+        """
+        with self._decision_lock:
+            with self._lock:
+                request_data = self._requests.get(request_id)
+                if request_data is None or request_data['status'] != 'PENDING':
+                    return None
+                previous = {field: request_data[field] for field in ('status', 'approval_date', 'comments')}
+                changes = {'status': status, 'approval_date': datetime.datetime.now(), 'comments': comments}
+                # Applied before the journal write so a concurrent compaction keeps it
+                request_data.update(changes)
+            try:
+                self._append_journal([{'op': 'status', 'request_id': request_id, 'changes': changes}])
+            except OSError:
+                with self._lock:
+                    request_data.update(previous)
+                raise
+        return request_data
+
+    def _work(self):
+        while True:
+            request_data, enqueued, attempt = self._queue.get()
+            request_id = request_data['request_id']
+            with self._lock:
+                self._in_flight += 1
+            try:
+                emails = {
+                    'director_email': send_approval_email(request_data),
+                    'student_email': send_student_confirmation(request_data),
+                    'completed': datetime.datetime.now(),
+                }
+                self._store(request_id, emails)
+                with self._lock:
+                    self._outstanding.pop(request_id, None)
+                self._append_journal([{'op': 'done', 'request_id': request_id}])
+                outcome = 'processed'
+            except Exception as exc:
+                with self._lock:
+                    self._outstanding[request_id] = request_data
+                if attempt < self.max_attempts:
+                    outcome = 'retried'
+                    # Back off exponentially, then try again on any worker
+                    delay = self.retry_seconds * 2 ** (attempt - 1)
+                    timer = threading.Timer(delay, self._queue.put, args=((request_data, enqueued, attempt + 1),))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    # Left in the journal, so a restart tries it again
+                    outcome = 'failed'
+                    self._store(request_id, {'error': f"{type(exc).__name__}: {exc}",
+                                             'completed': datetime.datetime.now()})
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._counts[outcome] += 1
+                    if outcome != 'retried':
+                        self._waiting.discard(request_id)
+                        self._process_ms.append((time.perf_counter() - enqueued) * 1000)
+                    if outcome == 'processed':
+                        self._done_since_compact += 1
+                    compact = self._done_since_compact >= self.compact_every or (
+                        self._done_since_compact and not self._waiting)
+                self._queue.task_done()
+            if compact:
+                self._compact_journal()
+
+    def _store(self, request_id, emails):
+        with self._lock:
+            if request_id not in self._outbox:
+                self._outbox_order.append(request_id)
+            self._outbox[request_id] = emails
+            while len(self._outbox_order) > self._outbox_size:
+                self._outbox.pop(self._outbox_order.popleft(), None)
+
+    def outbox(self, request_id):
+        """Rendered emails for a request (or an ``error`` entry), None while it is still queued.
+
+        Once a finished request has been evicted from the outbox (or was
+        finished before a restart) an ``expired`` entry is returned instead.
+        """
+        with self._lock:
+            emails = self._outbox.get(request_id)
+            if emails is None and request_id not in self._waiting:
+                return {'expired': True}
+            return emails
+
+    def metrics(self):
+        """Snapshot of queue depth, counters and latency percentiles"""
+        with self._lock:
+            admit_ms = list(self._admit_ms)
+            process_ms = list(self._process_ms)
+            snapshot = dict(self._counts)
+            snapshot.update({
+                'requests': len(self._requests),
+                'queue_depth': self._queue.qsize(),
+                'in_flight': self._in_flight,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+            })
+        snapshot.update({
+            'admit_p50_ms': _percentile(admit_ms, 50),
+            'admit_p99_ms': _percentile(admit_ms, 99),
+            'process_p99_ms': _percentile(process_ms, 99),
+        })
+        return snapshot
+
+# Reply commands are only read from the director's own text, above any quoted original
+REPLY_COMMAND_RE = re.compile(
+    r'^[ \t]*(?:(?:re|fwd?|aw)[ \t]*:[ \t]*)*(APPROVED|REJECTED)[ \t]*[-\u2013\u2014:][ \t]*(CSR-\d{8}-\d+)\b'
+    r'(?:[ \t]*[-\u2013\u2014:][ \t]*([^\r\n]*))?',
+    re.IGNORECASE | re.MULTILINE)
+REPLY_QUOTE_RE = re.compile(
+    r'^(?:>|On .+ wrote:[ \t]*$|-{2,}[ \t]*Original Message[ \t]*-{2,}|From:[ \t])',
+    re.IGNORECASE | re.MULTILINE)
+MBOX_SEPARATOR = b'From '
+
+def _iter_mbox_messages(path):
+    """Yield raw messages from an mbox file in a single sequential read"""
+    lines = []
+    previous_blank = True
+    with open(path, 'rb') as mbox_file:
+        for line in mbox_file:
+            if previous_blank and line.startswith(MBOX_SEPARATOR):
+                if lines:
+                    yield b''.join(lines)
+                lines = []
+            else:
+                lines.append(line)
+            previous_blank = line in (b'\n', b'\r\n')
+    if lines:
+        yield b''.join(lines)
+
+def _iter_maildir_messages(path):
+    """Yield raw messages from a Maildir (new/ and cur/)"""
+    box = mailbox.Maildir(path, factory=None, create=False)
+    for key in box.iterkeys():
+        yield box.get_bytes(key)
+
+def _reply_text(message):
+    """First text/plain part of a message, cut at the quoted original"""
+    for part in message.walk():
+        if part.get_content_type() == 'text/plain' and not part.get_filename():
+            payload = part.get_payload(decode=True) or b''
+            text = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+            quote = REPLY_QUOTE_RE.search(text)
+            return text[:quote.start()] if quote else text
+    return ''
+
+def scan_director_replies(path, mailbox_format='mbox', processed_ids=()):
+    """Stream a mailbox and yield one parsed reply per message.
+
+    Messages whose Message-ID is in ``processed_ids`` are skipped after
+    reading their headers only. Each reply is a dict with ``message_id``,
+    ``sender``, ``date`` (aware datetime, or None) and a list of
+    ``(action, request_id, comment)`` commands.
+    """
+    iter_messages = _iter_maildir_messages if mailbox_format == 'Maildir' else _iter_mbox_messages
+    header_parser = BytesHeaderParser()
+    for raw in iter_messages(path):
+        headers = header_parser.parsebytes(raw)
+        message_id = (headers.get('Message-ID') or '').strip()
+        if not message_id:
+            message_id = '<sha1-' + hashlib.sha1(raw).hexdigest() + '>'
+        if message_id in processed_ids:
+            continue
+
+        sender = parseaddr(headers.get('From') or '')[1].lower()
+        try:
+            sent = parsedate_to_datetime(headers.get('Date'))
+            if sent.tzinfo is None:
+                sent = sent.replace(tzinfo=datetime.timezone.utc)
+        except (TypeError, ValueError):
+            sent = None
+        commands = []
+        if sender == DIRECTOR_EMAIL.lower():
+            text = (headers.get('Subject') or '') + '\n' + _reply_text(message_from_bytes(raw))
+            for action, request_id, comment in REPLY_COMMAND_RE.findall(text):
+                commands.append((action.upper(), request_id.upper(), comment.strip()))
+        yield {'message_id': message_id, 'sender': sender, 'date': sent, 'commands': commands}
+
+def load_processed_message_ids(path=PROCESSED_MESSAGE_IDS):
+    """Message-IDs of replies that have already been applied"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as ids_file:
+        return {line.strip() for line in ids_file if line.strip()}
+
+def load_deferred_message_ids(path=DEFERRED_MESSAGE_IDS):
+    """Message-IDs of replies with unresolved commands, mapped to when they were first seen"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as deferred_file:
+        try:
+            return json.load(deferred_file)
+        except ValueError:
+            return {}
+
+def apply_director_replies(replies, submission_queue, processed_ids, deferred=None,
+                           ids_path=PROCESSED_MESSAGE_IDS, deferred_path=DEFERRED_MESSAGE_IDS,
+                           max_age_days=REPLY_MAX_AGE_DAYS, now=None):
+    """Apply scanned reply commands to the requests held by ``submission_queue``.
+
+    Letters for every approval are rendered before any request is changed.
+    A request whose letter cannot be printed (MissingGlyphsError) is left
+    pending and reported in ``letter_failures``; the rest of the batch is
+    applied. A message is only recorded as processed once every command in
+    it is resolved. Until then it is kept in ``deferred`` and tried again
+    on the next scan, unless it is older than ``max_age_days``. Those
+    messages are given up and listed in ``expired_messages``.
+    Returns ``(summary, letters)``.
+    """
+    deferred = {} if deferred is None else deferred
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    summary = {'messages': 0, 'approved': 0, 'rejected': 0, 'already_processed': 0,
+               'unknown_request': 0, 'deferred': 0, 'expired': 0, 'ignored': 0, 'rejected_ids': [],
+               'letter_failures': {}, 'expired_messages': []}
+    planned = {}
+    unresolved = {}
+    done_ids = []
+
+    for reply in replies:
+        summary['messages'] += 1
+        message_id = reply['message_id']
+        if reply['sender'] != DIRECTOR_EMAIL.lower() or not reply['commands']:
+            summary['ignored'] += 1
+            done_ids.append(message_id)
+            continue
+        sent = reply.get('date')
+        first_seen = deferred.get(message_id)
+        if first_seen:
+            first_seen = datetime.datetime.fromisoformat(first_seen)
+            sent = min(sent, first_seen) if sent else first_seen
+        unresolved[message_id] = {'sent': sent or now, 'requests': []}
+        for action, request_id, comment in reply['commands']:
+            req = submission_queue.get(request_id)
+            if req is None:
+                summary['unknown_request'] += 1
+                unresolved[message_id]['requests'].append(request_id)
+            elif req['status'] != 'PENDING' or request_id in planned:
+                summary['already_processed'] += 1
+            else:
+                planned[request_id] = (action, comment, message_id)
+
+    letters = {}
+    for request_id, (action, comment, message_id) in list(planned.items()):
+        if action != 'APPROVED':
+            continue
+        try:
+            letters[request_id] = render_letter_pdf(dict(submission_queue.get(request_id), comments=comment))
+        except MissingGlyphsError as exc:
+            summary['letter_failures'][request_id] = str(exc)
+            unresolved[message_id]['requests'].append(request_id)
+            del planned[request_id]
+
+    for request_id, (action, comment, message_id) in planned.items():
+        if action == 'REJECTED':
+            comment = comment or "Request rejected by Director (email reply)"
+        if submission_queue.decide(request_id, action, comment) is None:
+            # Decided meanwhile in another session
+            summary['already_processed'] += 1
+            letters.pop(request_id, None)
+        elif action == 'APPROVED':
+            summary['approved'] += 1
+        else:
+            summary['rejected'] += 1
+            summary['rejected_ids'].append(request_id)
+
+    cutoff = now - datetime.timedelta(days=max_age_days)
+    for message_id, pending in unresolved.items():
+        if not pending['requests']:
+            done_ids.append(message_id)
+            deferred.pop(message_id, None)
+        elif pending['sent'] < cutoff:
+            done_ids.append(message_id)
+            deferred.pop(message_id, None)
+            summary['expired'] += 1
+            summary['expired_messages'].append({'message_id': message_id, 'requests': pending['requests']})
+        else:
+            deferred.setdefault(message_id, now.isoformat())
+            summary['deferred'] += 1
+    if unresolved or os.path.exists(deferred_path):
+        os.makedirs(os.path.dirname(deferred_path) or '.', exist_ok=True)
+        with open(deferred_path, 'w', encoding='utf-8') as deferred_file:
+            json.dump(deferred, deferred_file)
+
+    if done_ids:
+        os.makedirs(os.path.dirname(ids_path) or '.', exist_ok=True)
+        with open(ids_path, 'a', encoding='utf-8') as ids_file:
+            ids_file.write(''.join(message_id + '\n' for message_id in done_ids))
+        processed_ids.update(done_ids)
+    return summary, letters
+
+class _IntervalNode:
+    __slots__ = ('start', 'end', 'item', 'left', 'right', 'height', 'max_end')
+
+    def __init__(self, start, end, item):
+        self.start = start
+        self.end = end
+        self.item = item
+        self.left = None
+        self.right = None
+        self.height = 1
+        self.max_end = end
+
+class IntervalTree:
+    """AVL tree of closed ``[start, end]`` intervals.
+
+    Each node also tracks the largest ``end`` in its subtree, so an overlap
+    query visits O(log n + k) nodes for k matches.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    @staticmethod
+    def _height(node):
+        return node.height if node else 0
+
+    def _update(self, node):
+        node.height = 1 + max(self._height(node.left), self._height(node.right))
+        node.max_end = max(node.end,
+                           node.left.max_end if node.left else node.end,
+                           node.right.max_end if node.right else node.end)
+
+    def _rotate_right(self, node):
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rebalance(self, node):
+        self._update(node)
+        balance = self._height(node.left) - self._height(node.right)
+        if balance > 1:
+            if self._height(node.left.left) < self._height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._height(node.right.right) < self._height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.start < node.start:
+            node.left = self._insert(node.left, new)
+        else:
+            node.right = self._insert(node.right, new)
+        return self._rebalance(node)
+
+    def insert(self, start, end, item):
+        self.root = self._insert(self.root, _IntervalNode(start, end, item))
+        self.size += 1
+
+    def overlapping(self, start, end):
+        """Items whose interval overlaps ``[start, end]``"""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end < start:
+                continue
+            if node.start <= end:
+                if node.end >= start:
+                    found.append(node.item)
+                stack.append(node.right)
+            stack.append(node.left)
+        return found
+
+def normalize_building_text(text):
+    """Case-, accent- and punctuation-insensitive key for building names and addresses.
+
+    Accents are only stripped from Latin letters; Kannada/Devanagari vowel
+    signs and viramas (category M) are kept, so distinct names stay distinct.
+    """
+    chars = []
+    latin_base = False
+    for ch in unicodedata.normalize('NFKD', text or ''):
+        if unicodedata.category(ch).startswith('M'):
+            if not latin_base:
+                chars.append(ch)
+            continue
+        latin_base = ch < '\u0250' or '\u1e00' <= ch <= '\u1eff'
+        chars.append(ch)
+    text = re.sub(r"[.'\u2019]", '', ''.join(chars).casefold())  # "J.C. Road" == "JC Road"
+    return ' '.join(''.join(ch if ch.isalnum() or unicodedata.category(ch).startswith('M') else ' '
+                            for ch in text).split())
+
+class VisitCalendar:
+    """Scheduled site visits, with one interval tree per building.
+
+    A building is keyed on its normalized name *and* normalized address, so
+    "Town Hall, J.C. Road" and "town hall, JC road" share a tree while two
+    "City Library" branches do not. Visits and rejections are appended to
+    ``log_path`` (when given) and replayed on start-up, so conflicts are
+    still found after a restart.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._trees = {}
+        self._by_id = {}
+        self._lock = threading.Lock()
+        if log_path:
+            self._replay()
+
+    @staticmethod
+    def _building_key(building_name, building_address):
+        return normalize_building_text(building_name), normalize_building_text(building_address)
+
+    def _insert(self, request_data):
+        key = self._building_key(request_data['building_name'], request_data['building_address'])
+        tree = self._trees.setdefault(key, IntervalTree())
+        tree.insert(request_data['visit_start'].toordinal(), request_data['visit_end'].toordinal(), request_data)
+        self._by_id[request_data['request_id']] = request_data
+
+    def _append_log(self, entry):
+        if not self.log_path:
+            return
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        with open(self.log_path, 'a', encoding='utf-8') as log:
+            log.write(json.dumps(entry, default=_json_default) + '\n')
+
+    def _replay(self):
+        """Rebuild the trees from the visit log"""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if entry.get('op') == 'visit':
+                    visit = _decode_request(entry['visit'])
+                    visit.setdefault('status', 'PENDING')
+                    self._insert(visit)
+                elif entry.get('op') == 'status' and entry.get('request_id') in self._by_id:
+                    self._by_id[entry['request_id']]['status'] = entry['status']
+
+    def add(self, request_data):
+        """Index a request's visit window under its building"""
+        with self._lock:
+            self._insert(request_data)
+            self._append_log({'op': 'visit', 'visit': {
+                field: request_data[field]
+                for field in ('request_id', 'building_name', 'building_address', 'visit_start', 'visit_end')
+            }})
+
+    def set_status(self, request_id, status):
+        """Record a status change (rejected visits stop counting as conflicts)"""
+        with self._lock:
+            visit = self._by_id.get(request_id)
+            if visit is None:
+                return
+            visit['status'] = status
+            self._append_log({'op': 'status', 'request_id': request_id, 'status': status})
+
+    def conflicts(self, request_data):
+        """Other non-rejected requests visiting the same building on overlapping dates"""
+        if not request_data.get('visit_start') or not request_data.get('visit_end'):
+            return []
+        with self._lock:
+            tree = self._trees.get(self._building_key(request_data['building_name'], request_data['building_address']))
+            if tree is None:
+                return []
+            overlapping = tree.overlapping(request_data['visit_start'].toordinal(), request_data['visit_end'].toordinal())
+        return [req for req in overlapping
+                if req['request_id'] != request_data['request_id'] and req['status'] != 'REJECTED']
+
+@st.cache_resource
+def get_visit_calendar():
+    """Process-wide visit calendar shared by all sessions"""
+    return VisitCalendar(VISIT_CALENDAR_LOG)
+
+@st.cache_resource
+def get_submission_queue():
+    """Process-wide submission queue shared by all sessions"""
+    return SubmissionQueue(SUBMISSION_JOURNAL, workers=SUBMISSION_WORKERS,
+                           max_pending=SUBMISSION_QUEUE_MAX, max_attempts=SUBMISSION_MAX_ATTEMPTS,
+                           retry_seconds=SUBMISSION_RETRY_SECONDS, compact_every=SUBMISSION_COMPACT_EVERY)
+
+class ArtifactCache:
+    """Per-session LRU store for generated PDFs and exports.
+
+    Holds at most ``max_bytes`` of data; the least recently used artifacts
+    are dropped first and regenerated on demand by the caller.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        """Store ``data`` under ``key`` and return it; oversize artifacts are not kept"""
+        if key in self._items:
+            self.total_bytes -= len(self._items.pop(key))
+        if len(data) > self.max_bytes:
+            return data
+        self._items[key] = data
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.total_bytes -= len(evicted)
+            self.evictions += 1
+        return data
+
+class SessionRegistry:
+    """Sessions seen within ``idle_seconds`` and their artifact memory, for the System Information page.
+
+    Streamlit has no session-end hook, so a closed tab counts until it goes idle.
+    """
+
+    def __init__(self, idle_seconds):
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_key, artifact_bytes, request_count):
+        with self._lock:
+            self._sessions[session_key] = (time.monotonic(), artifact_bytes, request_count)
+
+    def snapshot(self):
+        """Drop sessions idle longer than ``idle_seconds`` and total the rest"""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for session_key in [key for key, (seen, _, _) in self._sessions.items() if seen < cutoff]:
+                del self._sessions[session_key]
+            sessions = list(self._sessions.values())
+        return {
+            'active_sessions': len(sessions),
+            'artifact_bytes': sum(artifact_bytes for _, artifact_bytes, _ in sessions),
+            'requests': sum(request_count for _, _, request_count in sessions),
+        }
+
+@st.cache_resource
+def get_session_registry():
+    """Process-wide registry of recently active sessions"""
+    return SessionRegistry(SESSION_IDLE_SECONDS)
+
+def process_memory_mb():
+    """Current resident memory of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def report_session():
+    """Record this session's artifact memory once the page has rendered"""
+    get_session_registry().touch(st.session_state.session_key, st.session_state.artifacts.total_bytes,
+                                 len(st.session_state.requests_db))
+
+@st.cache_resource
+def get_static_assets():
+    """CSS, header/footer HTML and navigation options, built once per process"""
+    return {
+        'css': """
 <style>
     .main-header {
         background: linear-gradient(135deg, #1f4e79, #2d5aa0);
@@ -310,26 +981,87 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
-
-# Header
-st.markdown("""
+""",
+        'header': """
 <div class="main-header">
     <h1>🏛️ REVA UNIVERSITY</h1>
     <h2>School of Architecture - Case Study Management System</h2>
     <p>Streamlined case study approval process with automated letter generation</p>
 </div>
-""", unsafe_allow_html=True)
+""",
+        'footer': """
+<div style="text-align: center; color: #666; padding: 20px;">
+    <p>🏛️ <strong>REVA University Case Study Management System</strong></p>
+    <p>Developed for School of Architecture | Director: {DIRECTOR_EMAIL} | Office: {OFFICE_EMAIL}</p>
+    <p>Streamlined • Professional • Efficient</p>
+</div>
+""".format(DIRECTOR_EMAIL=DIRECTOR_EMAIL, OFFICE_EMAIL=OFFICE_EMAIL),
+        'pages': (
+            "📝 Student Request Form",
+            "✅ Director Approval",
+            "📊 Request Tracking",
+            "📧 Email Templates",
+            "ℹ️ System Information",
+        ),
+    }
+
+@st.cache_resource
+def get_sample_emails():
+    """Rendered sample emails for the Email Templates page"""
+    sample_request_data = {
+        'request_id': 'CSR-20241201-1001',
+        'student_name': 'John Doe',
+        'student_id': 'R123456',
+        'program': 'B.Arch',
+        'year': '3rd Year',
+        'email': 'john@reva.edu.in',
+        'phone': '+91 9876543210',
+        'building_name': 'Sample Building',
+        'building_address': 'Sample Address, Bangalore',
+        'building_type': 'Commercial',
+        'purpose': 'Architectural analysis',
+        'course': 'Design Studio',
+        'faculty_guide': 'Prof. Dr. A. Kumar',
+        'duration': '1 Week',
+        'visits': '2-3 Visits',
+        'documentation': 'Photography, Measurements',
+        'visit_start': datetime.date(2024, 12, 9),
+        'visit_end': datetime.date(2024, 12, 11),
+        'submission_date': datetime.datetime(2024, 12, 1, 10, 30),
+        'approval_date': datetime.datetime(2024, 12, 2, 9, 15),
+    }
+    return {
+        'student_confirmation': send_student_confirmation(sample_request_data),
+        'director_approval': send_approval_email(sample_request_data),
+        'approval_notification': send_approval_notification(sample_request_data, b"PDF_DATA"),
+    }
+
+# Streamlit App Configuration
+st.set_page_config(
+    page_title="REVA Case Study Management",
+    page_icon="🏛️",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Per-session artifact store, reported to the process-wide session registry
+if 'artifacts' not in st.session_state:
+    st.session_state.artifacts = ArtifactCache(SESSION_ARTIFACT_BUDGET)
+if 'session_key' not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
+
+# Static assets are built once per process and shared by every session
+assets = get_static_assets()
+
+# Custom CSS
+st.markdown(assets['css'], unsafe_allow_html=True)
+
+# Header
+st.markdown(assets['header'], unsafe_allow_html=True)
 
 # Sidebar Navigation
 st.sidebar.title("📋 Navigation")
-page = st.sidebar.selectbox("Choose Function", [
-    "📝 Student Request Form",
-    "✅ Director Approval",
-    "📊 Request Tracking",
-    "📧 Email Templates",
-    "ℹ️ System Information"
-])
+page = st.sidebar.selectbox("Choose Function", assets['pages'])
 
 # STUDENT REQUEST FORM PAGE
 if page == "📝 Student Request Form":
@@ -372,6 +1104,11 @@ if page == "📝 Student Request Form":
             visits = st.selectbox("Number of Visits*", [
                 "", "Single Visit", "2-3 Visits", "4-5 Visits", "Multiple Visits (>5)"
             ])
+        col5, col6 = st.columns(2)
+        with col5:
+            visit_start = st.date_input("First Visit Date*", min_value=datetime.date.today())
+        with col6:
+            visit_end = st.date_input("Last Visit Date*", min_value=datetime.date.today())
         
         st.subheader("📋 Documentation Required")
         doc_cols = st.columns(3)
@@ -411,13 +1148,14 @@ if page == "📝 Student Request Form":
                 
                 if not doc_list:
                     st.error("❌ Please select at least one documentation type!")
+                elif visit_end < visit_start:
+                    st.error("❌ Last visit date cannot be before the first visit date!")
+                elif (visit_end - visit_start).days > MAX_VISIT_WINDOW_DAYS:
+                    st.error(f"❌ Visit dates must fall within {MAX_VISIT_WINDOW_DAYS} days!")
                 else:
-                    # Generate request ID
-                    request_id = generate_request_id()
-                    
-                    # Create request data
+                    # Create request data (the submission queue assigns the request ID)
                     request_data = {
-                        'request_id': request_id,
+                        'request_id': None,
                         'submission_date': datetime.datetime.now(),
                         'student_name': student_name,
                         'student_id': student_id,
@@ -433,6 +1171,8 @@ if page == "📝 Student Request Form":
                         'faculty_guide': faculty_guide,
                         'duration': duration,
                         'visits': visits,
+                        'visit_start': visit_start,
+                        'visit_end': visit_end,
                         'documentation': ', '.join(doc_list),
                         'special_requirements': special_requirements,
                         'status': 'PENDING',
@@ -440,54 +1180,145 @@ if page == "📝 Student Request Form":
                         'comments': ''
                     }
                     
-                    # Store in session state
-                    st.session_state.requests_db.append(request_data)
-                    
-                    # Show success message
-                    st.markdown(f"""
-                    <div class="success-box">
-                        <h4>✅ Request Submitted Successfully!</h4>
-                        <p><strong>Request ID:</strong> {request_id}</p>
-                        <p><strong>Status:</strong> PENDING APPROVAL</p>
-                        <p><strong>Submitted:</strong> {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Show next steps
-                    st.markdown("""
-                    ### 📋 Next Steps:
-                    1. Your request has been sent to the Director for approval
-                    2. You will receive notification within 24-48 hours
-                    3. If approved, you'll get an official permission letter
-                    4. Check your email regularly for updates
-                    """)
-                    
-                    # Show email content for director
-                    st.subheader("📧 Email Sent to Director")
-                    approval_email = send_approval_email(request_data)
-                    st.text_area("Director Email Content", approval_email, height=400)
-                    
-                    # Show email content for student
-                    st.subheader("📧 Confirmation Email for Student")
-                    student_email = send_student_confirmation(request_data)
-                    st.text_area("Student Confirmation", student_email, height=300)
+                    # Journal and queue the request; emails are rendered by the worker pool
+                    request_id = get_submission_queue().submit(request_data)
+                    if request_id is None:
+                        st.error("⏳ The system is handling a surge of submissions. Please try again in a minute!")
+                    else:
+                        # Store in session state and check the building's visit calendar
+                        st.session_state.requests_db.append(request_data)
+                        visit_calendar = get_visit_calendar()
+                        visit_conflicts = visit_calendar.conflicts(request_data)
+                        visit_calendar.add(request_data)
+                        
+                        # Show success message
+                        st.markdown(f"""
+                        <div class="success-box">
+                            <h4>✅ Request Submitted Successfully!</h4>
+                            <p><strong>Request ID:</strong> {request_id}</p>
+                            <p><strong>Status:</strong> PENDING APPROVAL</p>
+                            <p><strong>Submitted:</strong> {request_data['submission_date'].strftime('%Y-%m-%d %H:%M')}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                        
+                        if visit_conflicts:
+                            st.warning(f"⚠️ {len(visit_conflicts)} other visit(s) to this building overlap your dates. "
+                                       "The Director may ask you to reschedule.")
+                            st.dataframe(pd.DataFrame([
+                                {'request_id': req['request_id'], 'visit_dates': format_visit_window(req), 'status': req['status']}
+                                for req in visit_conflicts
+                            ]), use_container_width=True)
+                        
+                        # Show next steps
+                        st.markdown("""
+                        ### 📋 Next Steps:
+                        1. Your request has been sent to the Director for approval
+                        2. You will receive notification within 24-48 hours
+                        3. If approved, you'll get an official permission letter
+                        4. Check your email regularly for updates
+                        """)
+    
+    # Emails for this session's submissions, as the worker pool finishes them
+    if st.session_state.requests_db:
+        st.subheader("📧 Submission Emails")
+        submission_queue = get_submission_queue()
+        still_preparing = False
+        for req in reversed(st.session_state.requests_db[-5:]):
+            emails = submission_queue.outbox(req['request_id'])
+            with st.expander(f"{req['request_id']} - {req['building_name']}"):
+                if emails is None:
+                    still_preparing = True
+                    st.info("⏳ Emails are being prepared.")
+                elif 'expired' in emails:
+                    st.info("ℹ️ These emails are no longer held by the system. Your request is saved "
+                            "and its status is shown above.")
+                elif 'error' in emails:
+                    st.error(f"❌ We could not prepare the emails for this request ({emails['error']}). "
+                             f"Your request is saved; please contact {OFFICE_EMAIL} quoting {req['request_id']}.")
+                else:
+                    st.text_area("Director Email Content", emails['director_email'], height=400,
+                                 key=f"director_email_{req['request_id']}")
+                    st.text_area("Student Confirmation", emails['student_email'], height=300,
+                                 key=f"student_email_{req['request_id']}")
+        # Rerun this session (a browser refresh would start a new, empty one)
+        if still_preparing and st.button("🔄 Check again"):
+            st.rerun()
 
 # DIRECTOR APPROVAL PAGE
 elif page == "✅ Director Approval":
     st.header("👨‍💼 Director Approval Dashboard")
     
-    # Show pending requests
-    pending_requests = [req for req in st.session_state.requests_db if req['status'] == 'PENDING']
+    # Bulk import of "APPROVED - CSR-..." / "REJECTED - CSR-..." email replies
+    with st.expander("📥 Import Director Email Replies"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            mailbox_path = st.text_input("Mailbox Path", value=REPLY_MAILBOX)
+        with col2:
+            mailbox_format = st.radio("Format", ["mbox", "Maildir"], horizontal=True)
+        
+        if st.button("📨 Scan Replies"):
+            if not os.path.exists(mailbox_path):
+                st.error(f"❌ Mailbox not found: {mailbox_path}")
+            else:
+                processed_ids = load_processed_message_ids()
+                replies = scan_director_replies(mailbox_path, mailbox_format, processed_ids)
+                try:
+                    summary, letters = apply_director_replies(replies, get_submission_queue(), processed_ids,
+                                                              load_deferred_message_ids())
+                except Exception as exc:
+                    st.error(f"❌ Import failed, no requests were changed: {exc}")
+                else:
+                    for request_id in summary['rejected_ids']:
+                        get_visit_calendar().set_status(request_id, 'REJECTED')
+                    st.success(f"✅ Scanned {summary['messages']} new message(s): "
+                               f"{summary['approved']} approved, {summary['rejected']} rejected"
+                               + (". Letters can be downloaded again from 📊 Request Tracking." if letters else ""))
+                    for request_id, error in summary['letter_failures'].items():
+                        st.error(f"❌ {request_id} left pending, letter not generated: {error}")
+                    if summary['deferred'] or summary['already_processed']:
+                        st.warning(f"⚠️ {summary['deferred']} message(s) with unknown request IDs or unprinted "
+                                   f"letters will be checked again on the next scan (for up to {REPLY_MAX_AGE_DAYS} "
+                                   f"days); {summary['already_processed']} command(s) already processed")
+                    if summary['expired_messages']:
+                        st.warning(f"⚠️ Gave up on {summary['expired']} reply message(s) older than "
+                                   f"{REPLY_MAX_AGE_DAYS} days. Decide these requests by hand:")
+                        st.dataframe(pd.DataFrame([
+                            {'message_id': expired['message_id'], 'requests': ', '.join(expired['requests'])}
+                            for expired in summary['expired_messages']
+                        ]), use_container_width=True)
+                    for request_id, letter in letters.items():
+                        st.session_state.artifacts.put(f"letter:{request_id}", letter)
+                        st.download_button(
+                            label=f"📥 Permission Letter - {request_id}",
+                            data=letter,
+                            file_name=f"Case_Study_Permission_{request_id}.pdf",
+                            mime="application/pdf",
+                            key=f"reply_letter_{request_id}"
+                        )
+    
+    # Show pending requests from every session (and those recovered from the journal)
+    submission_queue = get_submission_queue()
+    pending_requests = [req for req in submission_queue.requests() if req['status'] == 'PENDING']
     
     if pending_requests:
         st.subheader("📋 Pending Requests")
         
         # Create dataframe for display
         df_pending = pd.DataFrame(pending_requests)
+        visit_calendar = get_visit_calendar()
+        pending_conflicts = {req['request_id']: visit_calendar.conflicts(req) for req in pending_requests}
+        df_pending['visit_dates'] = [format_visit_window(req) for req in pending_requests]
+        df_pending['visit_conflicts'] = [len(pending_conflicts[req['request_id']]) for req in pending_requests]
         display_columns = ['request_id', 'student_name', 'student_id', 'building_name', 
-                          'purpose', 'submission_date', 'status']
+                          'purpose', 'visit_dates', 'visit_conflicts', 'submission_date', 'status']
         st.dataframe(df_pending[display_columns], use_container_width=True)
         
+        # Overlapping site visits at the same building
+        for request_id, conflicts in pending_conflicts.items():
+            if conflicts:
+                st.warning(f"⚠️ {request_id} overlaps with {len(conflicts)} other visit(s): "
+                           + ', '.join(f"{req['request_id']} ({format_visit_window(req)})" for req in conflicts))
+        
         # Quick approval section
         st.subheader("⚡ Quick Approval")
         
@@ -503,54 +1334,49 @@ elif page == "✅ Director Approval":
         
         if approve_btn and request_id_input:
             # Find and approve request
-            for req in st.session_state.requests_db:
-                if req['request_id'] == request_id_input and req['status'] == 'PENDING':
-                    # Update status
-                    req['status'] = 'APPROVED'
-                    req['approval_date'] = datetime.datetime.now()
-                    req['comments'] = comments_input
-                    
-                    # Generate PDF letter
-                    pdf = create_official_letter(req)
-                    pdf_buffer = io.BytesIO()
-                    pdf_output = pdf.output(dest='S').encode('latin1')
-                    pdf_buffer.write(pdf_output)
-                    pdf_buffer.seek(0)
-                    
-                    # Show success
-                    st.success(f"✅ Request {request_id_input} has been approved!")
+            req = submission_queue.get(request_id_input)
+            if req is None or req['status'] != 'PENDING':
+                st.error("❌ Request ID not found or already processed!")
+            else:
+                # Generate PDF letter first so a letter that cannot be printed leaves the request pending
+                try:
+                    letter = render_letter_pdf(dict(req, comments=comments_input))
+                except MissingGlyphsError as exc:
+                    st.error(f"❌ Letter not generated, request left pending: {exc}")
+                else:
+                    # Update status (journaled, so it survives a restart)
+                    if submission_queue.decide(request_id_input, 'APPROVED', comments_input) is None:
+                        st.error("❌ Request ID not found or already processed!")
+                    else:
+                        pdf_output = st.session_state.artifacts.put(f"letter:{req['request_id']}", letter)
                     
-                    # Show generated letter
-                    st.subheader("📄 Generated Official Letter")
-                    st.download_button(
-                        label="📥 Download Permission Letter (PDF)",
-                        data=pdf_buffer.getvalue(),
-                        file_name=f"Case_Study_Permission_{req['student_id']}.pdf",
-                        mime="application/pdf"
-                    )
+                        # Show success
+                        st.success(f"✅ Request {request_id_input} has been approved!")
                     
-                    # Show student notification
-                    st.subheader("📧 Student Notification")
-                    notification_email = send_approval_notification(req, pdf_buffer.getvalue())
-                    st.text_area("Email to Student", notification_email, height=400)
+                        # Show generated letter
+                        st.subheader("📄 Generated Official Letter")
+                        st.download_button(
+                            label="📥 Download Permission Letter (PDF)",
+                            data=pdf_output,
+                            file_name=f"Case_Study_Permission_{req['student_id']}.pdf",
+                            mime="application/pdf"
+                        )
                     
-                    break
-            else:
-                st.error("❌ Request ID not found or already processed!")
+                        # Show student notification
+                        st.subheader("📧 Student Notification")
+                        notification_email = send_approval_notification(req, pdf_output)
+                        st.text_area("Email to Student", notification_email, height=400)
         
         if reject_btn and request_id_input:
             # Find and reject request
-            for req in st.session_state.requests_db:
-                if req['request_id'] == request_id_input and req['status'] == 'PENDING':
-                    req['status'] = 'REJECTED'
-                    req['approval_date'] = datetime.datetime.now()
-                    req['comments'] = comments_input or "Request rejected by Director"
-                    
-                    st.warning(f"❌ Request {request_id_input} has been rejected!")
-                    st.write(f"**Reason:** {req['comments']}")
-                    break
-            else:
+            req = submission_queue.decide(request_id_input, 'REJECTED', comments_input or "Request rejected by Director")
+            if req is None:
                 st.error("❌ Request ID not found or already processed!")
+            else:
+                get_visit_calendar().set_status(req['request_id'], 'REJECTED')
+                
+                st.warning(f"❌ Request {request_id_input} has been rejected!")
+                st.write(f"**Reason:** {req['comments']}")
     
     else:
         st.markdown("""
@@ -563,10 +1389,11 @@ elif page == "✅ Director Approval":
 # REQUEST TRACKING PAGE
 elif page == "📊 Request Tracking":
     st.header("📈 All Requests Dashboard")
+    all_requests = get_submission_queue().requests()
     
-    if st.session_state.requests_db:
+    if all_requests:
         # Create comprehensive dataframe
-        df_all = pd.DataFrame(st.session_state.requests_db)
+        df_all = pd.DataFrame(all_requests)
         
         # Summary statistics
         col1, col2, col3, col4 = st.columns(4)
@@ -586,8 +1413,13 @@ elif page == "📊 Request Tracking":
         st.subheader("📊 All Requests")
         st.dataframe(df_all, use_container_width=True)
         
-        # Download option
-        csv_data = df_all.to_csv(index=False)
+        # Download option (export is rebuilt only when a request is added or changes status)
+        export_key = "export:csv:" + hashlib.sha1(
+            '|'.join(f"{req['request_id']}:{req['status']}" for req in all_requests).encode()
+        ).hexdigest()
+        csv_data = st.session_state.artifacts.get(export_key)
+        if csv_data is None:
+            csv_data = st.session_state.artifacts.put(export_key, df_all.to_csv(index=False).encode('utf-8'))
         st.download_button(
             label="📥 Download Data (CSV)",
             data=csv_data,
@@ -595,6 +1427,27 @@ elif page == "📊 Request Tracking":
             mime="text/csv"
         )
         
+        # Permission letters, kept in the session's artifact store or regenerated
+        approved_requests = [req for req in all_requests if req['status'] == 'APPROVED']
+        if approved_requests:
+            st.subheader("📄 Permission Letters")
+            letter_request = st.selectbox("Approved Request", approved_requests,
+                                          format_func=lambda req: f"{req['request_id']} - {req['student_name']}")
+            letter_key = f"letter:{letter_request['request_id']}"
+            letter = st.session_state.artifacts.get(letter_key)
+            try:
+                if letter is None:
+                    letter = st.session_state.artifacts.put(letter_key, render_letter_pdf(letter_request))
+            except MissingGlyphsError as exc:
+                st.error(f"❌ {exc}")
+            else:
+                st.download_button(
+                    label="📥 Download Permission Letter (PDF)",
+                    data=letter,
+                    file_name=f"Case_Study_Permission_{letter_request['student_id']}.pdf",
+                    mime="application/pdf"
+                )
+        
     else:
         st.markdown("""
         <div class="info-box">
@@ -618,43 +1471,19 @@ elif page == "📧 Email Templates":
     
     tab1, tab2, tab3 = st.tabs(["Student Confirmation", "Director Approval", "Approval Notification"])
     
+    sample_emails = get_sample_emails()
+    
     with tab1:
         st.write("**Email sent to students after submission:**")
-        sample_student_data = {
-            'request_id': 'CSR-20241201-1001',
-            'student_name': 'John Doe',
-            'building_name': 'Sample Building',
-            'purpose': 'Architectural analysis',
-            'submission_date': datetime.datetime.now()
-        }
-        st.text_area("Student Confirmation Email", send_student_confirmation(sample_student_data), height=400)
+        st.text_area("Student Confirmation Email", sample_emails['student_confirmation'], height=400)
     
     with tab2:
         st.write("**Email sent to director for approval:**")
-        sample_request_data = {
-            'request_id': 'CSR-20241201-1001',
-            'student_name': 'John Doe',
-            'student_id': 'R123456',
-            'program': 'B.Arch',
-            'year': '3rd Year',
-            'email': 'john@reva.edu.in',
-            'phone': '+91 9876543210',
-            'building_name': 'Sample Building',
-            'building_address': 'Sample Address, Bangalore',
-            'building_type': 'Commercial',
-            'purpose': 'Architectural analysis',
-            'course': 'Design Studio',
-            'faculty_guide': 'Prof. Dr. A. Kumar',
-            'duration': '1 Week',
-            'visits': '2-3 Visits',
-            'documentation': 'Photography, Measurements',
-            'submission_date': datetime.datetime.now()
-        }
-        st.text_area("Director Approval Email", send_approval_email(sample_request_data), height=400)
+        st.text_area("Director Approval Email", sample_emails['director_approval'], height=400)
     
     with tab3:
         st.write("**Email sent to students when approved:**")
-        st.text_area("Approval Notification Email", send_approval_notification(sample_request_data, b"PDF_DATA"), height=400)
+        st.text_area("Approval Notification Email", sample_emails['approval_notification'], height=400)
 
 # SYSTEM INFORMATION PAGE
 elif page == "ℹ️ System Information":
@@ -672,7 +1501,7 @@ elif page == "ℹ️ System Information":
     5. Share URL with students and director
     
     **Option 2: Local Deployment**
-    1. Install: `pip install streamlit fpdf2 pandas`
+    1. Install: `pip install -r requirements.txt`
     2. Run: `streamlit run app.py`
     3. Access at: `http://localhost:8501`
     
@@ -739,15 +1568,55 @@ elif page == "ℹ️ System Information":
     - Professional image for institution
     """)
     
+    st.subheader("📈 Submission Queue")
+    queue_stats = get_submission_queue().metrics()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Queue Depth", f"{queue_stats['queue_depth']} / {queue_stats['max_pending']}")
+        st.metric("In Flight", f"{queue_stats['in_flight']} / {queue_stats['workers']} workers")
+    with col2:
+        st.metric("Accepted", queue_stats['accepted'])
+        st.metric("Rejected (Busy)", queue_stats['rejected'])
+    with col3:
+        st.metric("Processed", queue_stats['processed'])
+        st.metric("Failed", queue_stats['failed'], f"{queue_stats['retried']} retries", delta_color="off")
+    with col4:
+        st.metric("Submit p50 / p99", f"{queue_stats['admit_p50_ms']:.1f} / {queue_stats['admit_p99_ms']:.1f} ms")
+        st.metric("Email p99", f"{queue_stats['process_p99_ms']:.1f} ms")
+
+    st.subheader("🧠 Session Resources")
+    report_session()
+    session_stats = get_session_registry().snapshot()
+    process_memory = process_memory_mb()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(f"Sessions (Active Last {SESSION_IDLE_SECONDS // 60} min)", session_stats['active_sessions'],
+                  f"{session_stats['requests']} requests held", delta_color="off")
+    with col2:
+        st.metric("Artifacts (All Sessions)", f"{session_stats['artifact_bytes'] / (1024 * 1024):.2f} MB")
+    with col3:
+        st.metric("Artifacts (This Session)",
+                  f"{st.session_state.artifacts.total_bytes / (1024 * 1024):.2f} / {SESSION_ARTIFACT_BUDGET / (1024 * 1024):.0f} MB",
+                  f"{st.session_state.artifacts.evictions} evicted", delta_color="off")
+    with col4:
+        st.metric("Process Memory (RSS)", f"{process_memory:.0f} MB" if process_memory is not None else "N/A")
+    
     st.subheader("🔧 Technical Requirements")
     st.markdown("""
     **Dependencies:**
     ```
     streamlit>=1.28.0
     pandas>=1.5.0
-    fpdf2>=2.7.0
+    fpdf2>=2.7.5
+    uharfbuzz
     ```
     
+    **Letter Fonts:**
+    - Noto Sans (one embedded face), vendored in `fonts/` (SIL OFL)
+    - Noto Kannada/Devanagari fallbacks, embedded only in letters that use those scripts
+    - Override the main face with `REVA_LETTER_FONT`
+    - Letters containing characters no installed font can print are refused with an error
+    
     **Email Integration:**
     - Configure SMTP settings for automated emails
     - Use institution email server
@@ -755,16 +1624,15 @@ elif page == "ℹ️ System Information":
     
     **Data Storage:**
     - Currently: In-memory (session-based)
+    - Submission journal: `data/submission_journal.jsonl` (every request and decision, replayed on restart)
+    - Generated letters and exports: per-session LRU cache (`REVA_SESSION_ARTIFACT_MB`, default 8 MB)
     - Upgrade options: SQLite, PostgreSQL, Google Sheets
     - Export capabilities: CSV, Excel, PDF reports
     """)
 
 # Footer
 st.markdown("---")
-st.markdown("""
-<div style="text-align: center; color: #666; padding: 20px;">
-    <p>🏛️ <strong>REVA University Case Study Management System</strong></p>
-    <p>Developed for School of Architecture | Director: {DIRECTOR_EMAIL} | Office: {OFFICE_EMAIL}</p>
-    <p>Streamlined • Professional • Efficient</p>
-</div>
-""".format(DIRECTOR_EMAIL=DIRECTOR_EMAIL, OFFICE_EMAIL=OFFICE_EMAIL), unsafe_allow_html=True)
+st.markdown(assets['footer'], unsafe_allow_html=True)
+
+# Session totals include artifacts created during this run
+report_session()
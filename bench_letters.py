@@ -0,0 +1,73 @@
+# REVA University Case Study Management System
+# Letter PDF benchmark: trimmed cached letter fonts vs. untrimmed fonts loaded per
+# letter (baseline) and the core-font (Helvetica) path
+#
+# Usage: python bench_letters.py [runs]
+
+import datetime
+import statistics
+import sys
+import time
+
+import letter_pdf
+
+DIRECTOR_EMAIL = "dir.arch@reva.edu.in"
+
+SAMPLES = {
+    "ascii": {
+        'student_name': "Priya Sharma", 'building_name': "City Central Library",
+        'building_address': "12 MG Road, Bengaluru 560001",
+    },
+    "kannada+devanagari": {
+        'student_name': "ಪ್ರಿಯಾ ಶರ್ಮಾ (प्रिया शर्मा)", 'building_name': "ನಗರ ಕೇಂದ್ರ ಗ್ರಂಥಾಲಯ",
+        'building_address': "೧೨ ಎಂ.ಜಿ. ರಸ್ತೆ, ಬೆಂಗಳೂರು ೫೬೦೦೦೧",
+    },
+}
+
+def sample_request(fields):
+    request = {
+        'request_id': "CSR-20250101-1001", 'student_id': "R21AR001", 'year': "4th",
+        'program': "B.Arch", 'course': "Architectural Design VII", 'faculty_guide': "Prof. Rao",
+        'purpose': "Academic Case Study", 'building_type': "Public", 'duration': "1 week",
+        'visits': "2", 'documentation': "Photography, Sketches",
+        'visit_start': datetime.date(2025, 1, 6), 'visit_end': datetime.date(2025, 1, 8),
+    }
+    request.update(fields)
+    return request
+
+def measure(request, load_fonts, runs):
+    """Median render time and PDF size; ``load_fonts`` runs once per letter"""
+    letter_pdf.render_letter_pdf(request, DIRECTOR_EMAIL, load_fonts())  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = len(letter_pdf.render_letter_pdf(request, DIRECTOR_EMAIL, load_fonts()))
+        timings.append((time.perf_counter() - start) * 1000)
+    return size, statistics.median(timings)
+
+def main(runs=20):
+    start = time.perf_counter()
+    fonts = letter_pdf.get_letter_fonts()
+    trim_ms = (time.perf_counter() - start) * 1000
+    print(f"letter font: {fonts.regular or 'none (core fonts)'}")
+    print(f"fallbacks: {', '.join(fallback.family for fallback in fonts.fallbacks) or 'none'}; "
+          f"one-off trim {trim_ms:.0f} ms")
+    paths = (
+        ("core", lambda: letter_pdf.CORE_FONTS),
+        # Baseline: the untrimmed source fonts, parsed again for every letter
+        ("untrimmed", lambda: letter_pdf.load_letter_fonts(trim=False)),
+        ("trimmed", letter_pdf.get_letter_fonts),
+    )
+    print(f"{'sample':<20} {'path':<10} {'bytes':>8} {'median ms':>10}")
+    for name, fields in SAMPLES.items():
+        request = sample_request(fields)
+        for path, load_fonts in paths:
+            missing = letter_pdf.missing_letter_glyphs(request, load_fonts())
+            if missing:
+                print(f"{name:<20} {path:<10} skipped: {len(missing)} characters not covered")
+                continue
+            size, median_ms = measure(request, load_fonts, runs)
+            print(f"{name:<20} {path:<10} {size:>8} {median_ms:>10.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,311 @@
+# REVA University Case Study Management System
+# Official permission letter PDF generation (fpdf2)
+
+from fpdf import FPDF
+from fontTools import subset as font_subset
+from fontTools.ttLib import TTFont
+from collections import namedtuple
+import datetime
+import functools
+import hashlib
+import os
+
+# Vendored Noto fonts (SIL OFL, see fonts/OFL.txt)
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+
+# Trimmed fonts are cached here, keyed by source path and mtime
+FONT_CACHE_DIR = os.path.join(os.environ.get("REVA_DATA_DIR", "data"), "fonts")
+
+# Main letter face (first existing path wins); DejaVu Sans covers Latin only
+LETTER_FONT_CANDIDATES = [
+    os.environ.get("REVA_LETTER_FONT", ""),
+    os.path.join(FONT_DIR, "NotoSans-Regular.ttf"),
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+]
+
+# Fallback faces for scripts the main face does not cover
+LETTER_FALLBACK_FONTS = {
+    "NotoKannada": [
+        "/usr/share/fonts/truetype/noto/NotoSansKannada-Regular.ttf",
+        os.path.join(FONT_DIR, "NotoSerifKannada-Regular.otf"),
+    ],
+    "NotoDevanagari": [
+        "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Regular.ttf",
+        os.path.join(FONT_DIR, "NotoSerifDevanagari-Regular.otf"),
+    ],
+}
+
+# Latin, punctuation, Devanagari and Kannada - the scripts names and addresses use
+LETTER_FONT_UNICODES = "U+0020-024F,U+0300-036F,U+2000-206F,U+20B9,U+25CC,U+0900-097F,U+0C80-0CFF,U+1CD0-1CFF,U+A8E0-A8FF"
+
+# Request fields printed on the letter
+LETTER_TEXT_FIELDS = (
+    'request_id', 'building_name', 'building_address', 'student_name', 'student_id', 'year',
+    'program', 'course', 'faculty_guide', 'purpose', 'building_type', 'duration', 'visits',
+    'documentation',
+)
+
+LetterFonts = namedtuple('LetterFonts', ['regular', 'coverage', 'fallbacks'])
+LetterFallback = namedtuple('LetterFallback', ['family', 'path', 'coverage'])
+# Core fonts only (no TTF available): WinAnsi text, nothing embedded
+CORE_FONTS = LetterFonts(None, None, ())
+
+class MissingGlyphsError(ValueError):
+    """Raised instead of rendering a letter with characters no font can draw"""
+
+def _trim_font(source):
+    """Cut a font down to LETTER_FONT_UNICODES, keeping the layout tables shaping needs"""
+    source = os.path.abspath(source)
+    stem, ext = os.path.splitext(os.path.basename(source))
+    key = f"{source}\0{os.stat(source).st_mtime_ns}\0{LETTER_FONT_UNICODES}"
+    cached_path = os.path.join(
+        FONT_CACHE_DIR, f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:12]}{ext}")
+    if os.path.exists(cached_path):
+        return cached_path
+
+    options = font_subset.Options()
+    options.layout_features = ['*']
+    options.glyph_names = False
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    options.hinting = False
+    options.drop_tables += ['FFTM', 'TTFA']
+    font = font_subset.load_font(source, options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=font_subset.parse_unicodes(LETTER_FONT_UNICODES))
+    subsetter.subset(font)
+
+    os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+    tmp_path = cached_path + f".{os.getpid()}.tmp"
+    font_subset.save_font(font, tmp_path, options)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+def _first_existing(candidates):
+    return next((path for path in candidates if path and os.path.exists(path)), None)
+
+def _coverage(path):
+    return frozenset(TTFont(path, lazy=True).getBestCmap())
+
+def load_letter_fonts(trim=True):
+    """Locate the letter fonts and the codepoints each covers.
+
+    With ``trim`` each source font is cut down to LETTER_FONT_UNICODES
+    (cached on disk) so every letter parses small font files; fpdf2 then
+    subsets them again to the glyphs a letter uses. Returns CORE_FONTS
+    when no TTF is installed.
+    """
+    prepare = _trim_font if trim else os.path.abspath
+    regular = _first_existing(LETTER_FONT_CANDIDATES)
+    if regular is None:
+        return CORE_FONTS
+    regular = prepare(regular)
+    fallbacks = []
+    for family, candidates in LETTER_FALLBACK_FONTS.items():
+        path = _first_existing(candidates)
+        if path is not None:
+            path = prepare(path)
+            fallbacks.append(LetterFallback(family, path, _coverage(path)))
+    return LetterFonts(regular, _coverage(regular), tuple(fallbacks))
+
+@functools.lru_cache(maxsize=None)
+def get_letter_fonts():
+    """Process-wide trimmed letter fonts (see load_letter_fonts)"""
+    return load_letter_fonts()
+
+def _letter_text(request_data):
+    return ''.join(str(request_data.get(field) or '') for field in LETTER_TEXT_FIELDS)
+
+def needs_text_shaping(request_data):
+    """True if the letter has text beyond Latin/punctuation (Indic scripts, combining marks)"""
+    return any(ord(char) >= 0x0300 and not 0x2000 <= ord(char) <= 0x20CF
+               for char in _letter_text(request_data))
+
+def letter_fallbacks(request_data, fonts):
+    """Fallback faces the letter actually needs (unused fonts would still be embedded)"""
+    if fonts.coverage is None:
+        return ()
+    uncovered = {ord(char) for char in _letter_text(request_data)
+                 if not char.isspace() and ord(char) not in fonts.coverage}
+    return tuple(fallback for fallback in fonts.fallbacks if uncovered & fallback.coverage)
+
+def missing_letter_glyphs(request_data, fonts):
+    """Characters of the letter's fields that none of ``fonts`` can draw"""
+    missing = set()
+    for char in _letter_text(request_data):
+        if char.isspace():
+            continue
+        if fonts.coverage is None:
+            try:
+                char.encode('windows-1252')
+            except UnicodeEncodeError:
+                missing.add(char)
+        elif ord(char) not in fonts.coverage and not any(
+                ord(char) in fallback.coverage for fallback in fonts.fallbacks):
+            missing.add(char)
+    return sorted(missing)
+
+class CaseStudyPDF(FPDF):
+    """Letter layout with one embedded Unicode face from get_letter_fonts().
+
+    Only the regular face is embedded: headings and labels are set by size,
+    and bold/italic requests use the same face, so a Latin letter carries a
+    single font. Fallback faces are registered only for the scripts the
+    letter uses, since fpdf2 embeds every registered font. Text shaping
+    roughly doubles render time and size, so it is only switched on for
+    letters that need it (see needs_text_shaping).
+    """
+
+    LETTER_FAMILY = "LetterSans"
+
+    def __init__(self, fonts=CORE_FONTS, fallbacks=(), text_shaping=False):
+        super().__init__()
+        self.set_compression(True)
+        self.letter_font = None
+        if fonts.regular:
+            self.add_font(self.LETTER_FAMILY, '', fonts.regular)
+            for fallback in fallbacks:
+                self.add_font(fallback.family, '', fallback.path)
+            if fallbacks:
+                self.set_fallback_fonts([fallback.family for fallback in fallbacks], exact_match=False)
+            # Indic conjuncts and vowel signs need the shaping engine (uharfbuzz)
+            if text_shaping:
+                self.set_text_shaping(True)
+            self.letter_font = self.LETTER_FAMILY
+        else:
+            # Core-font fallback: WinAnsi covers the bullets
+            self.core_fonts_encoding = 'windows-1252'
+
+    def set_letter_font(self, style='', size=12):
+        """Select the letter font; the embedded face has no bold or italic variant"""
+        if self.letter_font is None:
+            self.set_font('Arial', style, size)
+        else:
+            self.set_font(self.letter_font, '', size)
+
+    def header(self):
+        # University Header
+        self.set_letter_font('B', 20)
+        self.cell(0, 15, 'REVA UNIVERSITY', 0, 1, 'C')
+        self.set_letter_font('B', 16)
+        self.cell(0, 10, 'SCHOOL OF ARCHITECTURE', 0, 1, 'C')
+        self.set_letter_font('', 12)
+        self.cell(0, 8, 'Bangalore, Karnataka, India', 0, 1, 'C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_letter_font('I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+def format_visit_window(request_data):
+    """Human-readable visit date range for emails and letters"""
+    visit_start = request_data.get('visit_start')
+    visit_end = request_data.get('visit_end')
+    if not visit_start or not visit_end:
+        return "To be scheduled"
+    if visit_start == visit_end:
+        return visit_start.strftime('%d %b %Y')
+    return f"{visit_start.strftime('%d %b %Y')} to {visit_end.strftime('%d %b %Y')}"
+
+def create_official_letter(request_data, director_email, fonts=None):
+    """Generate official permission letter PDF"""
+    fonts = get_letter_fonts() if fonts is None else fonts
+    missing = missing_letter_glyphs(request_data, fonts)
+    if missing:
+        raise MissingGlyphsError(
+            "The letter fonts cannot print " + ' '.join(missing)
+            + ". Set REVA_LETTER_FONT to a font that covers them or add a fallback face under fonts/.")
+
+    pdf = CaseStudyPDF(fonts, letter_fallbacks(request_data, fonts),
+                       text_shaping=needs_text_shaping(request_data))
+    pdf.add_page()
+
+    # Date and Reference
+    pdf.set_letter_font('B', 12)
+    pdf.cell(0, 8, f"Date: {datetime.datetime.now().strftime('%B %d, %Y')}", 0, 1)
+    pdf.cell(0, 8, f"Ref: {request_data['request_id']}", 0, 1)
+    pdf.ln(5)
+
+    # Recipient Details
+    pdf.set_letter_font('B', 12)
+    pdf.cell(0, 8, 'To: The Concerned Authority', 0, 1)
+    pdf.set_letter_font('', 12)
+    pdf.cell(0, 8, request_data['building_name'], 0, 1)
+    pdf.multi_cell(0, 6, request_data['building_address'])
+    pdf.ln(5)
+
+    # Subject
+    pdf.set_letter_font('B', 12)
+    pdf.cell(0, 8, 'Subject: Permission for Architectural Case Study Research', 0, 1)
+    pdf.ln(5)
+
+    # Main Content
+    pdf.set_letter_font('', 12)
+    pdf.cell(0, 8, 'Dear Sir/Madam,', 0, 1)
+    pdf.ln(3)
+
+    # Student Introduction
+    intro_text = f"This letter serves as an official recommendation for {request_data['student_name']}, Student ID: {request_data['student_id']}, a {request_data['year']} year student pursuing {request_data['program']} at REVA University, School of Architecture."
+    pdf.multi_cell(0, 6, intro_text)
+    pdf.ln(3)
+
+    # Case Study Details
+    details_text = f"The student is conducting an architectural case study of {request_data['building_name']} as part of their academic research work for the course '{request_data['course']}' under the guidance of {request_data['faculty_guide']}."
+    pdf.multi_cell(0, 6, details_text)
+    pdf.ln(3)
+
+    # Study Requirements
+    pdf.set_letter_font('B', 12)
+    pdf.cell(0, 8, 'Study Requirements:', 0, 1)
+    pdf.set_letter_font('', 12)
+    pdf.cell(0, 6, f"• Purpose: {request_data['purpose']}", 0, 1)
+    pdf.cell(0, 6, f"• Building Type: {request_data['building_type']}", 0, 1)
+    pdf.cell(0, 6, f"• Expected Duration: {request_data['duration']}", 0, 1)
+    pdf.cell(0, 6, f"• Number of Visits: {request_data['visits']}", 0, 1)
+    pdf.cell(0, 6, f"• Visit Dates: {format_visit_window(request_data)}", 0, 1)
+    pdf.cell(0, 6, f"• Documentation Required: {request_data['documentation']}", 0, 1)
+    pdf.ln(5)
+
+    # Academic Declaration
+    declaration_text = "This study is strictly for academic and research purposes only. All documentation will be used solely for educational objectives and will not be used for any commercial purposes."
+    pdf.multi_cell(0, 6, declaration_text)
+    pdf.ln(3)
+
+    # Request
+    request_text = "We kindly request your permission to allow our student to conduct this case study. The student has been briefed on maintaining professionalism and respecting all property guidelines."
+    pdf.multi_cell(0, 6, request_text)
+    pdf.ln(3)
+
+    # Closing
+    pdf.multi_cell(0, 6, "Thank you for your cooperation in supporting architectural education.")
+    pdf.ln(8)
+
+    # Signature Block
+    pdf.cell(0, 8, 'Yours sincerely,', 0, 1)
+    pdf.ln(15)
+
+    pdf.set_letter_font('B', 12)
+    pdf.cell(0, 6, '[DIGITAL SIGNATURE]', 0, 1)
+    pdf.cell(0, 6, 'Dr. [Director Name]', 0, 1)
+    pdf.cell(0, 6, 'Director, School of Architecture', 0, 1)
+    pdf.cell(0, 6, 'REVA University', 0, 1)
+    pdf.set_letter_font('', 10)
+    pdf.cell(0, 6, f'Email: {director_email}', 0, 1)
+    pdf.cell(0, 6, 'Phone: [Director Phone]', 0, 1)
+
+    # Footer Information
+    pdf.ln(10)
+    pdf.set_letter_font('', 8)
+    pdf.cell(0, 4, '-' * 80, 0, 1)
+    pdf.cell(0, 4, f"Request ID: {request_data['request_id']}", 0, 1)
+    pdf.cell(0, 4, f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}", 0, 1)
+    pdf.cell(0, 4, 'Status: APPROVED - Official Permission Letter', 0, 1)
+
+    return pdf
+
+def render_letter_pdf(request_data, director_email, fonts=None):
+    """Render the official letter to compressed PDF bytes"""
+    return bytes(create_official_letter(request_data, director_email, fonts).output())